@@ -2,17 +2,21 @@
 This module configures the installation setup for the laMEG package, facilitating its installation
 and post-installation steps.
 """
+# Heavier modules are imported in the methods that use them, so that invocations of this script
+# that only need the package metadata do not pay for them
 import site
 import os
-import glob
-import shutil
-import subprocess
 import sys
+import sysconfig
 import platform
-import zipfile
 from setuptools import setup, find_packages
 from setuptools.command.install import install
 
+# Buffer size used when streaming large files to disk
+COPY_BUFFER_SIZE = 1 << 20
+# Number of parallel connections used to download large files
+DOWNLOAD_CONNECTIONS = 8
+
 class CustomInstall(install):
     """
     Custom installation class to handle additional setup tasks for the laMEG package.
@@ -23,8 +27,45 @@ class CustomInstall(install):
     - Setting up necessary environment variables.
     - Downloading and extracting test data.
     - Setting up Jupyter extensions.
+
+    An existing MATLAB runtime (R2019a, v96) can be used instead of downloading and installing
+    one, by passing --matlab-runtime-dir or setting the SPM_MATLAB_RUNTIME_DIR environment
+    variable to the directory containing its v96 folder.
     """
 
+    user_options = install.user_options + [
+        ('matlab-runtime-dir=', None,
+         'use an existing MATLAB runtime (R2019a) in this directory instead of installing one'),
+    ]
+
+    def initialize_options(self):
+        """
+        Initializes the command options, along with the state shared by the installation steps.
+        """
+        super().initialize_options()
+        self.matlab_runtime_dir = None
+        self.package_dirs = {}
+        self.base_dir = None
+        self.system = None
+        self.spm_pkg_dir = None
+
+
+    def finalize_options(self):
+        """
+        Finalizes the command options.
+
+        Raises:
+        FileNotFoundError: If an existing MATLAB runtime directory is given but does not exist.
+        """
+        super().finalize_options()
+        if self.matlab_runtime_dir is None:
+            self.matlab_runtime_dir = os.environ.get('SPM_MATLAB_RUNTIME_DIR')
+        if self.matlab_runtime_dir is not None:
+            self.matlab_runtime_dir = os.path.abspath(self.matlab_runtime_dir)
+            if not os.path.isdir(self.matlab_runtime_dir):
+                raise FileNotFoundError(f"MATLAB runtime directory {self.matlab_runtime_dir} "
+                                        f"does not exist")
+
 
     def run(self):
         """
@@ -32,10 +73,17 @@ class CustomInstall(install):
 
         This method runs the standard installation, installs additional components like
         SPM and MATLAB runtime, sets environment variables, and sets up Jupyter extensions.
+        The MATLAB runtime is only installed if an existing one has not been given.
         """
+        # Computed once here and shared by the installation steps below
+        self.base_dir = os.path.abspath(os.path.dirname(__file__))
+        self.system = platform.system()
+
         self.install_spm()
         super().run()
-        self.install_matlab_runtime()
+        self.spm_pkg_dir = self.get_installed_package_dir('spm_standalone')
+        if self.matlab_runtime_dir is None:
+            self.install_matlab_runtime()
         self.set_environment_variables()
 
 
@@ -44,31 +92,405 @@ class CustomInstall(install):
         Installs the SPM standalone package.
 
         This method assembles the SPM standalone package from its parts if not already assembled,
-        and installs it using the local setup.py script.
-        """
-        base_dir = os.path.abspath(os.path.dirname(__file__))
-        spm_dir = os.path.join(base_dir, 'build/lib/spm/')
-        if not os.path.exists(os.path.join(spm_dir, 'spm_standalone', 'spm_standalone.ctf')):
-            os.chdir(os.path.join(spm_dir, 'spm_standalone'))
-            subprocess.check_call(['bysp', 'c', 'spm_standalone.ctf'])
-            files = glob.glob(os.path.join(spm_dir, 'spm_standalone', 'spm_standalone.ctf.*.part'))
+        and installs it using the local setup.py script. If the installed package was built from
+        the same sources, as recorded by a marker file written after a successful install, the
+        install is skipped. The package is always assembled, as the build tree is also
+        installed as part of the spm package.
+        """
+        import subprocess
+
+        spm_dir = os.path.join(self.base_dir, 'build/lib/spm/')
+        spm_standalone_dir = os.path.join(spm_dir, 'spm_standalone')
+        ctf_path = os.path.join(spm_standalone_dir, 'spm_standalone.ctf')
+        if not os.path.exists(ctf_path):
+            with os.scandir(spm_standalone_dir) as entries:
+                files = [entry.path for entry in entries
+                         if entry.name.startswith('spm_standalone.ctf.')
+                         and entry.name.endswith('.part')]
+            files.sort(key=self.get_part_index)
+            if self.check_ctf_parts(files):
+                self.combine_ctf_parts(files, ctf_path)
+            else:
+                subprocess.check_call(['bysp', 'c', 'spm_standalone.ctf'], cwd=spm_standalone_dir)
             for file in files:
                 os.remove(file)
-        os.chdir(spm_dir)
-        subprocess.check_call([sys.executable, "setup.py", "install"])
-        os.chdir(base_dir)
+
+        fingerprint = self.get_spm_fingerprint(spm_standalone_dir)
+        try:
+            marker_path = os.path.join(self.get_installed_package_dir('spm_standalone'),
+                                       '_version.txt')
+            with open(marker_path, 'r', encoding='utf-8') as in_file:
+                if in_file.read().strip() == fingerprint:
+                    print('SPM standalone is already installed, skipping')
+                    return
+        except FileNotFoundError:
+            pass
+
+        # Keep a record of the installed files so the runtime package can be cleanly removed.
+        # It is kept out of build/lib, as everything there is installed into the spm package.
+        record_path = os.path.join(os.path.abspath(self.build_base), 'spm_standalone_files.txt')
+        subprocess.check_call([sys.executable, "setup.py", "install", "--record", record_path],
+                              cwd=spm_dir)
+
+        # Any location found before the install may be a stale copy elsewhere on the path
+        self.package_dirs.pop('spm_standalone', None)
+        marker_path = os.path.join(self.get_installed_package_dir('spm_standalone'),
+                                   '_version.txt')
+        with open(marker_path, 'w', encoding='utf-8') as out_file:
+            out_file.write(fingerprint)
+        with open(record_path, 'a', encoding='utf-8') as out_file:
+            out_file.write(marker_path + '\n')
+
+
+    @staticmethod
+    def get_spm_fingerprint(spm_standalone_dir):
+        """
+        Computes a cheap fingerprint of the SPM standalone sources.
+
+        The fingerprint is based on file names and sizes only, so no file contents are read.
+        The CTF archive counts by its total size, so the fingerprint is the same whether or not
+        it has been reassembled from its parts.
+
+        Parameters:
+        spm_standalone_dir (str): The directory containing the SPM standalone sources.
+
+        Returns:
+        str: The hex digest identifying the sources.
+        """
+        import hashlib
+
+        ctf_size = 0
+        entries = []
+        with os.scandir(spm_standalone_dir) as dir_entries:
+            for entry in dir_entries:
+                if not entry.is_file():
+                    continue
+                size = entry.stat().st_size
+                if entry.name == 'spm_standalone.ctf' or (
+                        entry.name.startswith('spm_standalone.ctf.')
+                        and entry.name.endswith('.part')):
+                    ctf_size += size
+                else:
+                    entries.append(f'{entry.name}:{size}')
+        entries.append(f'spm_standalone.ctf:{ctf_size}')
+        return hashlib.sha256('\n'.join(sorted(entries)).encode('utf-8')).hexdigest()
+
+
+    @staticmethod
+    def get_part_index(part_path):
+        """
+        Gets the index of a part file created by ByteSplitter (bysp).
+
+        Parameters:
+        part_path (str): The path of a part file, named <file>.<index>.part.
+
+        Returns:
+        int: The index of the part.
+        """
+        return int(part_path.rsplit('.', 2)[1])
+
+
+    def check_ctf_parts(self, part_paths):
+        """
+        Checks that a set of ByteSplitter part files can be combined in-process.
+
+        bysp splits a file by dealing its bytes out to the parts in turn, so a complete set of
+        parts is numbered 0 to N-1 and no part is more than one byte longer than any part after
+        it.
+
+        Parameters:
+        part_paths (list of str): The part files, sorted by index.
+
+        Returns:
+        bool: True if the parts form a complete, consistent set, False otherwise.
+        """
+        if not part_paths:
+            return False
+        if [self.get_part_index(path) for path in part_paths] != list(range(len(part_paths))):
+            return False
+        sizes = [os.path.getsize(path) for path in part_paths]
+        return (all(size >= next_size for size, next_size in zip(sizes, sizes[1:]))
+                and sizes[0] - sizes[-1] <= 1)
+
+
+    @staticmethod
+    def combine_ctf_parts(part_paths, ctf_path):
+        """
+        Reassembles a file from its ByteSplitter parts.
+
+        This does the same job as `bysp c`, but streams the parts in fixed-size chunks and
+        interleaves them with slice assignment instead of building the whole file in memory one
+        byte at a time. The output is written to a temporary file and moved into place once
+        complete, so an interrupted run never leaves a truncated file behind.
+
+        Parameters:
+        part_paths (list of str): The part files, sorted by index.
+        ctf_path (str): The path of the file to reassemble.
+        """
+        n_parts = len(part_paths)
+        chunk_size = max(COPY_BUFFER_SIZE // n_parts, 1)
+        tmp_path = ctf_path + '.tmp'
+        parts = [open(path, 'rb') for path in part_paths]
+        try:
+            with open(tmp_path, 'wb') as out_file:
+                while True:
+                    chunks = [part.read(chunk_size) for part in parts]
+                    total = sum(len(chunk) for chunk in chunks)
+                    if not total:
+                        break
+                    buffer = bytearray(total)
+                    for idx, chunk in enumerate(chunks):
+                        buffer[idx::n_parts] = chunk
+                    out_file.write(buffer)
+        finally:
+            for part in parts:
+                part.close()
+        os.replace(tmp_path, ctf_path)
 
 
     def download_file(self, url, save_path):
         """
         Downloads a file from a given URL to the specified path.
 
+        The download is skipped if a previous, verified download already exists at the path.
+        Large files are fetched over several connections in parallel if the server supports
+        range requests, and streamed over a single connection otherwise. The file is written to
+        a temporary path and only moved into place once complete and of the size reported by
+        the server, so an interrupted download is never mistaken for a finished one. If the
+        server supports range requests, a later install resumes an interrupted single-stream
+        download rather than starting it again. The SHA-256 digest of the finished file is
+        recorded next to it so that later installs can verify it. If the server reports the
+        size of the file in neither the HEAD nor the GET response, the download cannot be
+        confirmed as complete, so it is used but no digest is recorded and it is not reused.
+
         Parameters:
         url (str): The URL to download the file from.
         save_path (str): The local path to save the downloaded file.
+
+        Raises:
+        OSError: If the downloaded file does not have the size reported by the server.
+        """
+        import urllib.error
+        import urllib.request
+
+        if self.verify_download(save_path):
+            return
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        part_path = save_path + '.part'
+
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, method='HEAD')) as response:
+                # Resolve any redirect once, rather than in every range request
+                url = response.geturl()
+                size = int(response.headers.get('Content-Length') or 0)
+                accepts_ranges = response.headers.get('Accept-Ranges') == 'bytes'
+        except urllib.error.HTTPError:
+            # Some servers do not support HEAD, so fall back to a plain download of unknown size
+            size = 0
+            accepts_ranges = False
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if not accepts_ranges or offset > size:
+            offset = 0
+
+        if offset and offset == size:
+            # An earlier attempt finished the transfer but stopped before moving the file
+            digest = self.file_sha256(part_path)
+        elif offset or not accepts_ranges or size < DOWNLOAD_CONNECTIONS * COPY_BUFFER_SIZE:
+            digest, stream_size = self.download_stream(url, part_path, offset)
+            size = size or stream_size
+        else:
+            # Ranges complete out of order, so they are written to a separate file that is
+            # never resumed from
+            ranges_path = save_path + '.ranges'
+            if self.download_ranges(url, ranges_path, size):
+                os.replace(ranges_path, part_path)
+                digest = self.file_sha256(part_path)
+            else:
+                os.remove(ranges_path)
+                digest, stream_size = self.download_stream(url, part_path)
+                size = size or stream_size
+
+        if size and os.path.getsize(part_path) != size:
+            raise OSError(f"Download of {url} is incomplete: expected {size} bytes, got "
+                          f"{os.path.getsize(part_path)}")
+        os.replace(part_path, save_path)
+        if size:
+            with open(save_path + '.sha256', 'w', encoding='utf-8') as out_file:
+                out_file.write(digest)
+
+
+    @staticmethod
+    def download_stream(url, save_path, offset=0):
+        """
+        Downloads a file over a single connection, computing its SHA-256 digest as it goes.
+
+        Parameters:
+        url (str): The URL to download the file from.
+        save_path (str): The local path to save the downloaded file.
+        offset (int): The number of bytes already downloaded to the path by an interrupted
+        attempt. The download continues from there if the server honours the range request,
+        and starts again otherwise.
+
+        Returns:
+        tuple: The hex digest of the downloaded file, and its size as reported by the server,
+        or None if the server did not report it.
+
+        Raises:
+        OSError: If the connection closed before the reported size was received.
+        """
+        import hashlib
+        import urllib.request
+
+        digest = hashlib.sha256()
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header('Range', f'bytes={offset}-')
+        with urllib.request.urlopen(request) as response:
+            mode = 'wb'
+            size = None
+            if offset and response.status == 206:
+                mode = 'ab'
+                total = (response.headers.get('Content-Range') or '').rsplit('/', 1)[-1]
+                if total.isdigit():
+                    size = int(total)
+                elif response.headers.get('Content-Length'):
+                    size = offset + int(response.headers.get('Content-Length'))
+                with open(save_path, 'rb') as in_file:
+                    for chunk in iter(lambda: in_file.read(COPY_BUFFER_SIZE), b''):
+                        digest.update(chunk)
+            elif response.headers.get('Content-Length'):
+                size = int(response.headers.get('Content-Length'))
+            with open(save_path, mode) as out_file:
+                while True:
+                    chunk = response.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out_file.write(chunk)
+        # A connection closed early just ends the read loop, so check the length explicitly
+        if size is not None and os.path.getsize(save_path) != size:
+            raise OSError(f"Download of {url} is incomplete: expected {size} bytes, got "
+                          f"{os.path.getsize(save_path)}")
+        return digest.hexdigest(), size
+
+
+    @staticmethod
+    def download_ranges(url, save_path, size):
+        """
+        Downloads a file over several connections in parallel using HTTP range requests.
+
+        The file is preallocated and each connection writes its own byte range in place.
+
+        Parameters:
+        url (str): The URL to download the file from.
+        save_path (str): The local path to save the downloaded file.
+        size (int): The size of the file in bytes.
+
+        Returns:
+        bool: True if the file was downloaded, False if the server rejected a range request,
+        in which case the file is incomplete.
+
+        Raises:
+        OSError: If a range is incomplete.
         """
-        if not os.path.exists(save_path):
-            subprocess.check_call(['curl', '-s', '-L', '-o', save_path, url])
+        import urllib.error
+        import urllib.request
+        from concurrent.futures import ThreadPoolExecutor
+
+        range_size = -(-size // DOWNLOAD_CONNECTIONS)
+        fd = os.open(save_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+        def fetch_range(start):
+            end = min(start + range_size, size) - 1
+            request = urllib.request.Request(url, headers={'Range': f'bytes={start}-{end}'})
+            try:
+                response = urllib.request.urlopen(request)
+            except urllib.error.HTTPError:
+                return False
+            with response:
+                if response.status != 206:
+                    return False
+                offset = start
+                while True:
+                    chunk = response.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    view = memoryview(chunk)
+                    while view:
+                        written = os.pwrite(fd, view, offset)
+                        view = view[written:]
+                        offset += written
+            if offset != end + 1:
+                raise OSError(f"Incomplete download of bytes {start}-{end} from {url}")
+            return True
+
+        try:
+            os.ftruncate(fd, size)
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_CONNECTIONS) as executor:
+                return all(list(executor.map(fetch_range, range(0, size, range_size))))
+        finally:
+            os.close(fd)
+
+
+    def verify_download(self, path):
+        """
+        Checks whether a downloaded file is complete and intact.
+
+        Parameters:
+        path (str): The path of the downloaded file.
+
+        Returns:
+        bool: True if the file exists and matches the SHA-256 digest recorded when its download
+        completed, False otherwise.
+        """
+        digest_path = path + '.sha256'
+        if not (os.path.exists(path) and os.path.exists(digest_path)):
+            return False
+        with open(digest_path, 'r', encoding='utf-8') as in_file:
+            expected = in_file.read().strip()
+        return self.file_sha256(path) == expected
+
+
+    @staticmethod
+    def file_sha256(path):
+        """
+        Computes the SHA-256 digest of a file without reading it into memory all at once.
+
+        Parameters:
+        path (str): The path of the file.
+
+        Returns:
+        str: The hex digest of the file contents.
+        """
+        import hashlib
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as in_file:
+            for chunk in iter(lambda: in_file.read(COPY_BUFFER_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+    @staticmethod
+    def get_cache_path(file_name):
+        """
+        Gets the path of a file in the per-user download cache.
+
+        Large downloads are kept here rather than in the source tree so that they are reused
+        across clean checkouts and environment rebuilds.
+
+        Parameters:
+        file_name (str): The name of the cached file.
+
+        Returns:
+        str: The path to the file in the cache directory.
+        """
+        # As per the XDG spec, an empty or relative XDG_CACHE_HOME is ignored
+        cache_dir = os.environ.get('XDG_CACHE_HOME')
+        if not cache_dir or not os.path.isabs(cache_dir):
+            cache_dir = os.path.expanduser('~/.cache')
+        return os.path.join(cache_dir, 'laMEG', file_name)
 
 
     def extract_matlab_runtime(self, zip_path, extract_to):
@@ -79,13 +501,113 @@ class CustomInstall(install):
         zip_path (str): The path to the ZIP file containing the MATLAB runtime.
         extract_to (str): The directory to extract the contents to.
         """
+        import threading
+        import zipfile
+        from concurrent.futures import ThreadPoolExecutor
+
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            os.makedirs(extract_to, exist_ok=True)
-            zip_ref.extractall(extract_to)
-            for root, _, files in os.walk(extract_to):
-                for file in files:
-                    if file.endswith('.sh') or file == 'install' or 'bin' in root:
-                        os.chmod(os.path.join(root, file), 0o755)
+            infos = zip_ref.infolist()
+
+        # Create the directory tree up front so that worker threads never race on makedirs.
+        # Each directory is created once, parents before children, rather than once per entry.
+        dirs = {os.path.normpath(extract_to)}
+        file_infos = []
+        for info in infos:
+            target = os.path.normpath(self.get_extract_path(extract_to, info.filename))
+            if info.is_dir():
+                dirs.add(target)
+            elif target != os.path.normpath(extract_to):
+                dirs.add(os.path.dirname(target))
+                file_infos.append(info)
+        for directory in sorted(dirs, key=len):
+            os.makedirs(directory, exist_ok=True)
+
+        # The runtime consists of thousands of small files, so extraction is bound by
+        # per-file syscall latency rather than CPU. ZipFile handles should not be shared
+        # between threads, so each worker lazily opens its own.
+        local = threading.local()
+        handles = []
+
+        def extract_one(info):
+            zip_ref = getattr(local, 'zip_ref', None)
+            if zip_ref is None:
+                zip_ref = zipfile.ZipFile(zip_path, 'r')
+                local.zip_ref = zip_ref
+                handles.append(zip_ref)
+            self.extract_zip_entry(zip_ref, info, extract_to)
+
+        try:
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                list(executor.map(extract_one, file_infos))
+        finally:
+            for zip_ref in handles:
+                zip_ref.close()
+
+
+    def extract_zip_entry(self, zip_ref, info, extract_to):
+        """
+        Extracts a single file entry from an open ZIP file.
+
+        The entry is streamed to disk in fixed-size chunks and, if required, made executable
+        through the still-open file descriptor, so the extracted tree never has to be walked a
+        second time and the path is not resolved again. The parent directory of the entry must
+        already exist.
+
+        Parameters:
+        zip_ref (zipfile.ZipFile): The open ZIP file to read from.
+        info (zipfile.ZipInfo): The entry to extract.
+        extract_to (str): The directory to extract the entry to.
+        """
+        import shutil
+
+        target = self.get_extract_path(extract_to, info.filename)
+        with zip_ref.open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            if self.is_executable_entry(info):
+                os.fchmod(dst.fileno(), 0o755)
+
+
+    @staticmethod
+    def get_extract_path(extract_to, member_name):
+        """
+        Gets the path a ZIP entry should be extracted to.
+
+        The entry name is sanitised the same way as ZipFile.extract does it, by dropping any
+        drive letter, leading separators and empty, '.' and '..' components, so that no entry
+        can be written outside the extraction directory.
+
+        Parameters:
+        extract_to (str): The directory being extracted to.
+        member_name (str): The name of the entry in the ZIP file.
+
+        Returns:
+        str: The path to extract the entry to.
+        """
+        arcname = member_name.replace('/', os.path.sep)
+        if os.path.altsep:
+            arcname = arcname.replace(os.path.altsep, os.path.sep)
+        arcname = os.path.splitdrive(arcname)[1]
+        parts = [part for part in arcname.split(os.path.sep)
+                 if part not in ('', os.path.curdir, os.path.pardir)]
+        return os.path.join(extract_to, *parts)
+
+
+    @staticmethod
+    def is_executable_entry(info):
+        """
+        Determines whether an entry of the MATLAB runtime ZIP file should be made executable.
+
+        Parameters:
+        info (zipfile.ZipInfo): The ZIP entry to check.
+
+        Returns:
+        bool: True if the entry has an executable bit set in the archive, or is a shell script,
+        the installer, or lives in a bin directory.
+        """
+        if (info.external_attr >> 16) & 0o111:
+            return True
+        dir_name, file_name = os.path.split(info.filename)
+        return file_name.endswith('.sh') or file_name == 'install' or 'bin' in dir_name
 
 
     def install_matlab_runtime(self):
@@ -98,18 +620,20 @@ class CustomInstall(install):
         This method downloads the MATLAB runtime ZIP file, extracts it, and runs the installation
         script in silent mode with the necessary parameters.
         """
-        base_dir = os.path.abspath(os.path.dirname(__file__))
-        system = platform.system()
+        import shutil
+        import subprocess
 
-        if system == 'Linux':
-            matlab_runtime_zip = os.path.join(base_dir, 'MATLAB_Runtime_R2019a_Update_9_glnxa64.zip')
+        if self.system == 'Linux':
+            matlab_runtime_zip = self.get_cache_path('MATLAB_Runtime_R2019a_Update_9_glnxa64.zip')
             matlab_download_url = (
                 'https://ssd.mathworks.com/supportfiles/downloads/R2019a/Release/9/'
                 'deployment_files/installer/complete/glnxa64/'
                 'MATLAB_Runtime_R2019a_Update_9_glnxa64.zip'
             )
-        elif system == 'Darwin':  # macOS
-            matlab_runtime_zip = os.path.join(base_dir, 'MATLAB_Runtime_R2019a_Update_9_maci64.dmg.zip')
+        elif self.system == 'Darwin':  # macOS
+            matlab_runtime_zip = self.get_cache_path(
+                'MATLAB_Runtime_R2019a_Update_9_maci64.dmg.zip'
+            )
             matlab_download_url = (
                 'https://ssd.mathworks.com/supportfiles/downloads/R2019a/Release/9/'
                 'deployment_files/installer/complete/maci64/'
@@ -121,17 +645,16 @@ class CustomInstall(install):
         # Download the appropriate MATLAB runtime file
         self.download_file(matlab_download_url, matlab_runtime_zip)
 
-        if system == 'Linux':
+        if self.system == 'Linux':
             # Extract and install on Linux
-            package_dir = self.get_installed_package_dir('spm_standalone')
-            matlab_runtime_extract_dir = os.path.join(package_dir, 'matlab_runtime')
+            matlab_runtime_extract_dir = os.path.join(self.spm_pkg_dir, 'matlab_runtime')
             self.extract_matlab_runtime(matlab_runtime_zip, matlab_runtime_extract_dir)
 
             install_script = os.path.join(matlab_runtime_extract_dir, 'install')
             if not os.path.exists(install_script):
                 raise FileNotFoundError(f"The install script was not found in {matlab_runtime_extract_dir}")
 
-            destination_dir = os.path.join(package_dir, '../MATLAB_Runtime')
+            destination_dir = os.path.join(self.spm_pkg_dir, '../MATLAB_Runtime')
             subprocess.check_call([
                 install_script, '-mode', 'silent', '-agreeToLicense', 'yes',
                 '-destinationFolder', destination_dir
@@ -140,16 +663,20 @@ class CustomInstall(install):
             # Clean up
             shutil.rmtree(matlab_runtime_extract_dir)
 
-        elif system == 'Darwin':
+        elif self.system == 'Darwin':
             # Unzip the dmg.zip file
-            subprocess.check_call(['unzip', '-q', matlab_runtime_zip, '-d', base_dir])
+            subprocess.check_call(['unzip', '-q', matlab_runtime_zip, '-d', self.base_dir])
 
             # Mount the .dmg file
-            dmg_path = os.path.join(base_dir, 'MATLAB_Runtime_R2019a_Update_9_maci64.dmg')
+            dmg_path = os.path.join(self.base_dir, 'MATLAB_Runtime_R2019a_Update_9_maci64.dmg')
             mount_point = '/Volumes/MATLAB_Runtime'
 
             try:
-                subprocess.check_call(['hdiutil', 'attach', dmg_path, '-mountpoint', mount_point])
+                # Skip checksum verification of the whole image and keep Finder out of the way
+                subprocess.check_call([
+                    'hdiutil', 'attach', dmg_path, '-mountpoint', mount_point,
+                    '-nobrowse', '-readonly', '-noverify', '-noautoopen', '-quiet'
+                ])
 
                 # Ensure the .dmg was mounted correctly
                 if not os.path.exists(mount_point):
@@ -170,7 +697,7 @@ class CustomInstall(install):
                 ])
             finally:
                 # Unmount the dmg file
-                subprocess.check_call(['hdiutil', 'detach', mount_point])
+                subprocess.check_call(['hdiutil', 'detach', mount_point, '-quiet'])
 
 
     def set_environment_variables(self):
@@ -189,53 +716,65 @@ class CustomInstall(install):
         os.makedirs(deactivate_script_dir, exist_ok=True)
         deactivate_script_path = os.path.join(deactivate_script_dir, "env_vars.sh")
 
-        system = platform.system()
-
-        if system == 'Linux':
+        if self.system == 'Linux':
             # For Linux
-            matlab_runtime_path = self.get_installed_package_dir('MATLAB_Runtime')
+            matlab_runtime_path = self.matlab_runtime_dir
+            if matlab_runtime_path is None:
+                matlab_runtime_path = self.get_installed_package_dir('MATLAB_Runtime')
             print(f'MATLAB runtime path={matlab_runtime_path}')
 
-            with open(activate_script_path, "w", encoding="utf-8") as out_file:
-                out_file.write(f'export MATLAB_RUNTIME_DIR="{matlab_runtime_path}"\n')
-                out_file.write('export _OLD_LD_LIBRARY_PATH="$LD_LIBRARY_PATH"\n')
-                out_file.write(
-                    'export LD_LIBRARY_PATH="${MATLAB_RUNTIME_DIR}/v96/runtime/glnxa64:'
-                    '${MATLAB_RUNTIME_DIR}/v96/bin/glnxa64:'
-                    '${MATLAB_RUNTIME_DIR}/v96/sys/os/glnxa64:'
-                    '$LD_LIBRARY_PATH"\n'
-                )
-                out_file.write('export XAPPLRESDIR="${MATLAB_RUNTIME_DIR}/v96/X11/app-defaults"\n')
-
-            with open(deactivate_script_path, "w", encoding="utf-8") as out_file:
-                out_file.write('unset MATLAB_RUNTIME_DIR\n')
-                out_file.write('export LD_LIBRARY_PATH="$_OLD_LD_LIBRARY_PATH"\n')
-                out_file.write('unset _OLD_LD_LIBRARY_PATH\n')
-                out_file.write('unset XAPPLRESDIR\n')
-
-        elif system == 'Darwin':  # macOS
+            activate_script = (
+                f'export MATLAB_RUNTIME_DIR="{matlab_runtime_path}"\n'
+                'export _OLD_LD_LIBRARY_PATH="$LD_LIBRARY_PATH"\n'
+                'export LD_LIBRARY_PATH="${MATLAB_RUNTIME_DIR}/v96/runtime/glnxa64:'
+                '${MATLAB_RUNTIME_DIR}/v96/bin/glnxa64:'
+                '${MATLAB_RUNTIME_DIR}/v96/sys/os/glnxa64:'
+                '$LD_LIBRARY_PATH"\n'
+                'export XAPPLRESDIR="${MATLAB_RUNTIME_DIR}/v96/X11/app-defaults"\n'
+            )
+            deactivate_script = (
+                'unset MATLAB_RUNTIME_DIR\n'
+                'export LD_LIBRARY_PATH="$_OLD_LD_LIBRARY_PATH"\n'
+                'unset _OLD_LD_LIBRARY_PATH\n'
+                'unset XAPPLRESDIR\n'
+            )
+
+        elif self.system == 'Darwin':  # macOS
             # For macOS
-            with open(activate_script_path, "w", encoding="utf-8") as out_file:
-                out_file.write('export _OLD_DYLD_LIBRARY_PATH="$DYLD_LIBRARY_PATH"\n')
-                out_file.write(
-                    'export DYLD_LIBRARY_PATH="/Applications/MATLAB/MATLAB_Runtime/v96/runtime/maci64:'
-                    '/Applications/MATLAB/MATLAB_Runtime/v96/sys/os/maci64:'
-                    '/Applications/MATLAB/MATLAB_Runtime/v96/bin/maci64:'
-                    '/Applications/MATLAB/MATLAB_Runtime/v96/extern/bin/maci64:'
-                    '$DYLD_LIBRARY_PATH"\n'
-                )
-
-            with open(deactivate_script_path, "w", encoding="utf-8") as out_file:
-                out_file.write('export DYLD_LIBRARY_PATH="$_OLD_DYLD_LIBRARY_PATH"\n')
-                out_file.write('unset _OLD_DYLD_LIBRARY_PATH\n')
+            matlab_runtime_path = self.matlab_runtime_dir
+            if matlab_runtime_path is None:
+                matlab_runtime_path = '/Applications/MATLAB/MATLAB_Runtime'
+
+            activate_script = (
+                'export _OLD_DYLD_LIBRARY_PATH="$DYLD_LIBRARY_PATH"\n'
+                f'export DYLD_LIBRARY_PATH="{matlab_runtime_path}/v96/runtime/maci64:'
+                f'{matlab_runtime_path}/v96/sys/os/maci64:'
+                f'{matlab_runtime_path}/v96/bin/maci64:'
+                f'{matlab_runtime_path}/v96/extern/bin/maci64:'
+                '$DYLD_LIBRARY_PATH"\n'
+            )
+            deactivate_script = (
+                'export DYLD_LIBRARY_PATH="$_OLD_DYLD_LIBRARY_PATH"\n'
+                'unset _OLD_DYLD_LIBRARY_PATH\n'
+            )
         else:
             raise OSError("Unsupported operating system")
 
+        # Each script is written out in a single call
+        with open(activate_script_path, "w", encoding="utf-8") as out_file:
+            out_file.write(activate_script)
+        with open(deactivate_script_path, "w", encoding="utf-8") as out_file:
+            out_file.write(deactivate_script)
+
 
     def get_installed_package_dir(self, package_name):
         """
         Finds the installation directory of a specified package.
 
+        The purelib directory of the running interpreter is checked first, then the other
+        site-packages directories. Once found, the directory is cached so that later lookups of
+        the same package do not search again.
+
         Parameters:
         package_name (str): The name of the package to locate.
 
@@ -245,10 +784,17 @@ class CustomInstall(install):
         Raises:
         FileNotFoundError: If the package is not found in the site-packages directories.
         """
+        if package_name in self.package_dirs:
+            return self.package_dirs[package_name]
+        potential_path = os.path.join(sysconfig.get_paths()['purelib'], package_name)
+        if os.path.isdir(potential_path):
+            self.package_dirs[package_name] = potential_path
+            return potential_path
         site_packages = site.getsitepackages()
         for site_package in site_packages:
             potential_path = os.path.join(site_package, package_name)
             if os.path.isdir(potential_path):
+                self.package_dirs[package_name] = potential_path
                 return potential_path
         raise FileNotFoundError(f"Package {package_name} not found in site-packages directories: "
                                 f"{site_packages}")